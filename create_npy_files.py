@@ -0,0 +1,62 @@
+import argparse
+import os
+
+import h5py
+import numpy as np
+from tqdm import tqdm
+
+
+def create_npy_files(data_folder, data_name, chunk_size=1024):
+    r"""Converts HDF5 images and tags created by create_input_files.py into .npy files,
+    so they can be memory-mapped by TagDataset instead of read through h5py.
+
+    Each file is written under a temporary name and moved into place once complete,
+    so an interrupted run never leaves a partial .npy file for TagDataset to pick up.
+
+    Arguments
+        data_folder: folder where data files are stored
+        data_name: base name of processed datasets
+        chunk_size: number of images copied at once
+    """
+
+    for split in ['TRAIN', 'VAL', 'TEST']:
+        for kind, key in [('IMAGES', 'images'), ('TAGS', 'tags')]:
+            path = os.path.join(data_folder, split + '_' +
+                                kind + '_' + data_name)
+            if not os.path.exists(path + '.hdf5'):
+                continue
+
+            print("\nConverting %s %s to .npy...\n" % (split, key))
+
+            tmp_path = path + '.npy.tmp'
+            with h5py.File(path + '.hdf5', 'r') as h:
+                source = h[key]
+                target = np.lib.format.open_memmap(
+                    tmp_path, mode='w+', dtype=source.dtype, shape=source.shape)
+
+                for i in tqdm(range(0, len(source), chunk_size)):
+                    target[i:i + chunk_size] = source[i:i + chunk_size]
+
+                target.flush()
+                del target
+
+            os.replace(tmp_path, path + '.npy')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='[Indonesian Image Captioning] -- Create Memory-Mapped Tag Files')
+
+    parser.add_argument('--data_folder', '-df', default='./scn_data',
+                        help='folder with data files saved by create_input_files.py')
+    parser.add_argument('--data_name', '-dn', default='flickr10k_5_cap_per_img_5_min_word_freq',
+                        help='base name shared by data files')
+
+    args = parser.parse_args()
+
+    print('Creating .npy files...')
+
+    create_npy_files(data_folder=args.data_folder,
+                     data_name=args.data_name)
+
+    print('.npy files created!')
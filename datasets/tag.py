@@ -3,46 +3,84 @@ from torch.utils.data import Dataset
 
 import h5py
 import json
+import numpy as np
 import os
 
 
 class TagDataset(Dataset):
     r"""A PyTorch Dataset class to be used in a PyTorch DataLoader to create batches.
 
+    Reads memory-mapped .npy files written by create_npy_files.py when they exist,
+    the HDF5 files otherwise.
+
     Arguments
         data_folder: folder where data files are stored
         data_name: base name of processed datasets
         split: split, one of 'TRAIN', 'VAL', or 'TEST'
-        transform: image transform pipeline
+        transform: image transform pipeline, applied to the uint8 image tensor
     """
 
     def __init__(self, data_folder, data_name, split, transform=None):
         self.split = split
         assert self.split in {'TRAIN', 'VAL', 'TEST'}
 
-        # Open hdf5 file where images are stored
-        self.h = h5py.File(os.path.join(
-            data_folder, self.split + '_IMAGES_' + data_name + '.hdf5'), 'r')
-        self.imgs = self.h['images']
+        images_base = os.path.join(
+            data_folder, self.split + '_IMAGES_' + data_name)
+        tags_base = os.path.join(
+            data_folder, self.split + '_TAGS_' + data_name)
 
-        # Load encoded captions (completely into memory)
-        self.t = h5py.File(os.path.join(
-            data_folder, self.split + '_TAGS_' + data_name + '.hdf5'), 'r')
-        self.tags = self.t['tags']
+        # Memory-mapped files are fork-safe and shared by all DataLoader workers
+        self.memmap = os.path.exists(images_base + '.npy') and \
+            os.path.exists(tags_base + '.npy')
+
+        # hdf5 files where images and tags are stored, opened lazily in each
+        # DataLoader worker since h5py handles can't be shared across processes
+        self.images_path = images_base + '.hdf5'
+        self.tags_path = tags_base + '.hdf5'
+        self.h = None
+        self.t = None
+        self.pid = None
+
+        if self.memmap:
+            self.imgs = np.load(images_base + '.npy', mmap_mode='r')
+            self.tags = np.load(tags_base + '.npy', mmap_mode='r')
 
         # PyTorch transformation pipeline for the image (normalizing, etc.)
         self.transform = transform
 
         # Total number of datapoints
-        self.dataset_size = len(self.tags)
+        if self.memmap:
+            self.dataset_size = len(self.tags)
+        else:
+            with h5py.File(self.tags_path, 'r') as t:
+                self.dataset_size = len(t['tags'])
+
+    def _open(self):
+        r"""Opens hdf5 files on first access in the current process."""
+        self.pid = os.getpid()
+
+        self.h = h5py.File(self.images_path, 'r')
+        self.imgs = self.h['images']
+
+        self.t = h5py.File(self.tags_path, 'r')
+        self.tags = self.t['tags']
 
     def __getitem__(self, i):
-        # Remember, the Nth caption corresponds to the (N // captions_per_image)th image
-        img = torch.FloatTensor(self.imgs[i] / 255.)
+        # Handles inherited from another process (e.g. forked workers) are not safe to use
+        if not self.memmap and (self.h is None or self.pid != os.getpid()):
+            self._open()
+
+        # Kept as uint8 (3, 256, 256), normalization is done on the device
+        img = self.imgs[i]
+        if self.memmap:
+            # copy out of the read-only mapping
+            img = img.copy()
+        img = torch.from_numpy(img)
         if self.transform is not None:
             img = self.transform(img)
 
-        tags = torch.FloatTensor(self.tags[i])
+        # np.array copies, so tags never share memory with a read-only mapping
+        tags = torch.from_numpy(np.array(self.tags[i], dtype=np.float32))
 
         return img, tags
 
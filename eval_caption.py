@@ -38,7 +38,7 @@ def evaluate(args):
     # DataLoader
     loader = DataLoader(
         CaptionDataset(args.data_folder, args.data_name, 'TEST',
-                       transform=transforms.Compose([normalize])),
+                       transform=normalize),
         batch_size=1, shuffle=True, num_workers=1, pin_memory=True)
 
     need_tag = args.type in scn_based_model
@@ -99,7 +99,7 @@ def evaluate(args):
         k = args.beam_size
 
         # Move to GPU device, if available
-        image = image.to(device)  # (1, 3, 256, 256)
+        image = image.to(device, non_blocking=True)  # (1, 3, 256, 256)
 
         # Encode (1, enc_image_size, enc_image_size, encoder_dim)
         encoder_out = encoder_caption(image)
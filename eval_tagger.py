@@ -1,12 +1,12 @@
 import torch.backends.cudnn as cudnn
 import torch.optim
 import torch.utils.data
-import torchvision.transforms as transforms
 
 from tqdm import tqdm
 
 from datasets import TagDataset
 from utils.metric import binary_accuracy
+from utils.prefetcher import CUDAPrefetcher
 
 # Parameters
 # folder with data files saved by create_input_files.py
@@ -26,9 +26,9 @@ encoder = checkpoint['encoder']
 encoder = encoder.to(device)
 encoder.eval()
 
-# Normalization transform
-normalize = transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                                 std=[0.229, 0.224, 0.225])
+# Normalization, done on device by the prefetcher
+mean = [0.485, 0.456, 0.406]
+std = [0.229, 0.224, 0.225]
 
 
 def evaluate():
@@ -40,23 +40,22 @@ def evaluate():
     """
     # DataLoader
     loader = torch.utils.data.DataLoader(
-        TagDataset(data_folder, data_name, 'TEST',
-                   transform=transforms.Compose([normalize])),
+        TagDataset(data_folder, data_name, 'TEST'),
         batch_size=1, shuffle=True, num_workers=1, pin_memory=True)
+    loader = CUDAPrefetcher(loader, device, mean=mean, std=std)
 
     accs = list()
 
     # For each image
     for i, (image, tags) in enumerate(tqdm(loader, desc="EVALUATING TAGS")):
 
-        # Move to GPU device, if available
-        image = image.to(device)  # (1, 3, 256, 256)
-        targets = tags.to(device)  # (1, 1000)
+        # Already on GPU device, if available
+        targets = tags  # (1, 1000)
 
         # Encode
         encoder_out = image  # (1, enc_image_size, enc_image_size, encoder_dim)
-        scores = encoder(encoder_out)  # (1, 1000)
-        acc = binary_accuracy(scores, targets)
+        scores = encoder(encoder_out, logits=True)  # (1, 1000)
+        acc = binary_accuracy(scores, targets, logits=True)
         accs.append(acc)
 
     return sum(accs) / len(accs) if len(accs) > 0 else 0
@@ -40,8 +40,7 @@ def read_image(image_path):
     img = torch.FloatTensor(img)
     normalize = transforms.Normalize(mean=[0.485, 0.456, 0.406],
                                      std=[0.229, 0.224, 0.225])
-    transform = transforms.Compose([normalize])
-    image = transform(img).to(device)  # (3, 256, 256)
+    image = normalize(img).to(device)  # (3, 256, 256)
 
     # Encode
     image = image.unsqueeze(0)  # (1, 3, 256, 256)
@@ -31,18 +31,21 @@ class EncoderTagger(nn.Module):
 
         self.fine_tune()
 
-    def forward(self, images):
+    def forward(self, images, logits=False):
         r"""Forward propagation.
 
         Arguments
             images (torch.Tensor): images, a tensor of dimensions (batch_size, 3, image_size, image_size)
+            logits (boolean, optional): return raw logits instead of probabilities (for BCEWithLogitsLoss)
         Returns 
-            torch.Tensor: probabilites of tags (batch_size, 1000)
+            torch.Tensor: probabilites (or logits) of tags (batch_size, 1000)
         """
         out = self.resnet(images)
         out = out.view(out.size(0), -1)   # (batch_size, 2048)
         out = self.dropout(out)    # (batch_size, 2048)
         out = self.linear(out)     # (batch_size, 1000)
+        if logits:
+            return out
         out = self.sigmoid(out)    # (batch_size, 1000)
         return out
 
@@ -122,11 +122,11 @@ def main():
                                      std=[0.229, 0.224, 0.225])
     train_loader = torch.utils.data.DataLoader(
         CaptionDataset(data_folder, data_name, 'TRAIN',
-                       transform=transforms.Compose([normalize])),
+                       transform=normalize),
         batch_size=batch_size, shuffle=True, num_workers=workers, pin_memory=True)
     val_loader = torch.utils.data.DataLoader(
         CaptionDataset(data_folder, data_name, 'VAL',
-                       transform=transforms.Compose([normalize])),
+                       transform=normalize),
         batch_size=batch_size, shuffle=True, num_workers=workers, pin_memory=True)
 
     # Epochs
@@ -205,9 +205,9 @@ def train(train_loader, encoder, encoder_tagger, decoder, criterion, encoder_opt
         data_time.update(time.time() - start)
 
         # Move to GPU, if available
-        imgs = imgs.to(device)
-        caps = caps.to(device)
-        caplens = caplens.to(device)
+        imgs = imgs.to(device, non_blocking=True)
+        caps = caps.to(device, non_blocking=True)
+        caplens = caplens.to(device, non_blocking=True)
 
         # Forward prop.
         encoder_out = encoder(imgs)
@@ -303,9 +303,9 @@ def validate(val_loader, encoder, encoder_tagger, decoder, criterion):
         for i, (imgs, caps, caplens, allcaps) in enumerate(val_loader):
 
             # Move to device, if available
-            imgs = imgs.to(device)
-            caps = caps.to(device)
-            caplens = caplens.to(device)
+            imgs = imgs.to(device, non_blocking=True)
+            caps = caps.to(device, non_blocking=True)
+            caplens = caplens.to(device, non_blocking=True)
 
             # Forward prop.
             encoder_out = encoder(imgs)
@@ -109,11 +109,11 @@ def main():
                                      std=[0.229, 0.224, 0.225])
     train_loader = torch.utils.data.DataLoader(
         CaptionDataset(data_folder, data_name, 'TRAIN',
-                       transform=transforms.Compose([normalize])),
+                       transform=normalize),
         batch_size=batch_size, shuffle=True, num_workers=workers, pin_memory=True)
     val_loader = torch.utils.data.DataLoader(
         CaptionDataset(data_folder, data_name, 'VAL',
-                       transform=transforms.Compose([normalize])),
+                       transform=normalize),
         batch_size=batch_size, shuffle=True, num_workers=workers, pin_memory=True)
 
     # Epochs
@@ -188,9 +188,9 @@ def train(train_loader, encoder, decoder, criterion, encoder_optimizer, decoder_
         data_time.update(time.time() - start)
 
         # Move to GPU, if available
-        imgs = imgs.to(device)
-        caps = caps.to(device)
-        caplens = caplens.to(device)
+        imgs = imgs.to(device, non_blocking=True)
+        caps = caps.to(device, non_blocking=True)
+        caplens = caplens.to(device, non_blocking=True)
 
         # Forward prop.
         imgs = encoder(imgs)
@@ -283,9 +283,9 @@ def validate(val_loader, encoder, decoder, criterion):
         for i, (imgs, caps, caplens, allcaps) in enumerate(val_loader):
 
             # Move to device, if available
-            imgs = imgs.to(device)
-            caps = caps.to(device)
-            caplens = caplens.to(device)
+            imgs = imgs.to(device, non_blocking=True)
+            caps = caps.to(device, non_blocking=True)
+            caplens = caplens.to(device, non_blocking=True)
 
             # Forward prop.
             if encoder is not None:
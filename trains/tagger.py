@@ -1,9 +1,11 @@
+import inspect
+import os
 import time
+from collections import defaultdict
 
 import torch.backends.cudnn as cudnn
 import torch.optim
 import torch.utils.data
-import torchvision.transforms as transforms
 from torch import nn
 from torch.nn.utils.rnn import pack_padded_sequence
 
@@ -15,6 +17,7 @@ from utils.checkpoint import save_tagger_checkpoint
 from utils.device import get_device
 from utils.metric import AverageMeter, binary_accuracy
 from utils.optimizer import clip_gradient, adjust_learning_rate
+from utils.prefetcher import CUDAPrefetcher
 
 # Data parameters
 data_folder = './scn_data'  # folder with data files saved by create_input_files.py
@@ -36,14 +39,28 @@ epochs = 10
 # keeps track of number of epochs since there's been an improvement in validation BLEU
 epochs_since_improvement = 0
 batch_size = 32
+accum_steps = 4  # batches to accumulate gradients over, effective batch size is batch_size * accum_steps
 adjust_lr_after_epoch = 4
 fine_tune_encoder = False
-workers = 1  # for data-loading; right now, only 1 works with h5py
+workers = min(8, os.cpu_count() or 1)  # for data-loading, hdf5 files are opened per worker
+prefetch_factor = 4  # batches loaded in advance by each worker
 encoder_lr = 1e-4  # learning rate for encoder if fine-tuning
 grad_clip = 5.  # clip gradients at an absolute value of
 best_acc = 0.  # Best acc right now
 print_freq = 100  # print training/validation stats every __ batches
 checkpoint = None  # path to checkpoint, None if none
+mean = [0.485, 0.456, 0.406]  # ImageNet normalization
+std = [0.229, 0.224, 0.225]
+use_amp = torch.cuda.is_available()  # mixed precision training, only on CUDA
+# multi-tensor Adam step: fused kernel on CUDA (torch >= 1.13), foreach otherwise, if supported
+adam_params = inspect.signature(torch.optim.Adam).parameters
+if torch.cuda.is_available() and 'fused' in adam_params:
+    adam_kwargs = {'fused': True}
+elif 'foreach' in adam_params:
+    adam_kwargs = {'foreach': True}
+else:
+    adam_kwargs = {}
+compile_encoder = torch.cuda.is_available() and hasattr(torch, 'compile')  # fuse encoder ops, PyTorch 2.x on CUDA only
 
 
 def main():
@@ -59,8 +76,7 @@ def main():
     if checkpoint is None:
         encoder = EncoderTagger(semantic_size=semantic_size, dropout=dropout)
         encoder.fine_tune(fine_tune_encoder)
-        encoder_optimizer = torch.optim.Adam(params=filter(lambda p: p.requires_grad, encoder.parameters()),
-                                             lr=encoder_lr)
+        encoder_optimizer = None
     else:
         checkpoint = torch.load(checkpoint)
         start_epoch = checkpoint['epoch'] + 1
@@ -69,26 +85,54 @@ def main():
         encoder = checkpoint['encoder']
         encoder_optimizer = checkpoint['encoder_optimizer']
         encoder.fine_tune(fine_tune_encoder)
-        encoder_optimizer = torch.optim.Adam(params=filter(lambda p: p.requires_grad, encoder.parameters()),
-                                             lr=encoder_lr)
 
-    # Move to GPU, if available
+    # Move to GPU, if available, in NHWC layout for faster (tensor core) convolutions
     encoder = encoder.to(device)
+    encoder = encoder.to(memory_format=torch.channels_last)
 
-    # Loss function
-    criterion = nn.BCELoss().to(device)
-
-    # Custom dataloaders
-    normalize = transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                                     std=[0.229, 0.224, 0.225])
+    if encoder_optimizer is None:
+        # Created after moving the encoder, fused Adam needs its parameters on device
+        encoder_optimizer = torch.optim.Adam(params=filter(lambda p: p.requires_grad, encoder.parameters()),
+                                             lr=encoder_lr, **adam_kwargs)
+    else:
+        # Keep the Adam moments from the checkpoint, only follow fine_tune_encoder
+        # changes to the set of trainable parameters (dropping state of frozen ones)
+        trainable = [p for p in encoder.parameters() if p.requires_grad]
+        keep = set(trainable)
+        encoder_optimizer.param_groups[0]['params'] = trainable
+        encoder_optimizer.state = defaultdict(dict, {p: v for p, v in encoder_optimizer.state.items()
+                                                     if p in keep})
+        # Checkpoints are saved from CPU copies; reloading the state dict moves the
+        # Adam moments onto the device of the parameters
+        encoder_optimizer.load_state_dict(encoder_optimizer.state_dict())
+
+    # Compiled view of the encoder for training, sharing its weights;
+    # the plain encoder is the one saved in checkpoints
+    # (no CUDA graphs: their reused output buffers are unsafe with gradient accumulation)
+    model = torch.compile(encoder, mode='max-autotune-no-cudagraphs') if compile_encoder else encoder
+
+    # Loss function, on logits since BCELoss is unsafe under autocast
+    criterion = nn.BCEWithLogitsLoss().to(device)
+
+    # Loss scaler for mixed precision training
+    scaler = torch.cuda.amp.GradScaler(enabled=use_amp)
+
+    # Custom dataloaders, images stay uint8 until normalized on device
     train_loader = torch.utils.data.DataLoader(
-        TagDataset(data_folder, data_name, 'TRAIN',
-                   transform=transforms.Compose([normalize])),
-        batch_size=batch_size, shuffle=True, num_workers=workers, pin_memory=True)
+        TagDataset(data_folder, data_name, 'TRAIN'),
+        batch_size=batch_size, shuffle=True, num_workers=workers, pin_memory=True,
+        persistent_workers=True, prefetch_factor=prefetch_factor)
     val_loader = torch.utils.data.DataLoader(
-        TagDataset(data_folder, data_name, 'VAL',
-                   transform=transforms.Compose([normalize])),
-        batch_size=batch_size, shuffle=True, num_workers=workers, pin_memory=True)
+        TagDataset(data_folder, data_name, 'VAL'),
+        batch_size=batch_size, shuffle=False, num_workers=workers, pin_memory=True,
+        persistent_workers=True, prefetch_factor=prefetch_factor)
+
+    # Overlap host to device copies with computation, and normalize on device
+    train_loader = CUDAPrefetcher(train_loader, device, mean=mean, std=std, channels_last=True)
+    val_loader = CUDAPrefetcher(val_loader, device, mean=mean, std=std, channels_last=True)
+
+    # Background thread writing the last checkpoint
+    save_thread = None
 
     # Epochs
     for epoch in range(start_epoch, epochs):
@@ -102,14 +146,15 @@ def main():
 
         # One epoch's training
         train(train_loader=train_loader,
-              encoder=encoder,
+              encoder=model,
               criterion=criterion,
               encoder_optimizer=encoder_optimizer,
+              scaler=scaler,
               epoch=epoch)
 
         # One epoch's validation
         acc = validate(val_loader=val_loader,
-                       encoder=encoder,
+                       encoder=model,
                        criterion=criterion)
 
         # Check if there was an improvement
@@ -124,12 +169,17 @@ def main():
 
         print('Saving checkpoint for epoch {}\n'.format(epoch + 1))
 
-        # Save checkpoint
-        save_tagger_checkpoint(data_name, epoch, epochs_since_improvement, encoder, encoder_optimizer,
-                               acc, is_best)
+        # Save checkpoint in the background, once the previous one is written
+        if save_thread is not None:
+            save_thread.join()
+        save_thread = save_tagger_checkpoint(data_name, epoch, epochs_since_improvement, encoder, encoder_optimizer,
+                                             acc, is_best, background=True)
+
+    if save_thread is not None:
+        save_thread.join()
 
 
-def train(train_loader, encoder, criterion, encoder_optimizer, epoch):
+def train(train_loader, encoder, criterion, encoder_optimizer, scaler, epoch):
     r"""Performs one epoch's training.
 
     Arguments
@@ -137,6 +187,7 @@ def train(train_loader, encoder, criterion, encoder_optimizer, epoch):
         encoder: encoder model
         criterion: loss layer
         encoder_optimizer: optimizer to update encoder's weights
+        scaler: gradient scaler for mixed precision training
         epoch: epoch number
     """
 
@@ -147,46 +198,62 @@ def train(train_loader, encoder, criterion, encoder_optimizer, epoch):
     losses = AverageMeter()  # loss (per word decoded)
     accs = AverageMeter()  # acc accuracy
 
+    # Metrics summed on device since the last print, to avoid syncing every batch
+    loss_sum = torch.zeros((), device=device)
+    acc_sum = torch.zeros((), device=device)
+    count = 0
+
+    num_batches = len(train_loader)
+
     start = time.time()
 
-    # Batches
-    for i, (imgs, tags) in enumerate(train_loader):
+    # Batches, already on device (moved by the prefetcher)
+    for i, (imgs, targets) in enumerate(train_loader):
         data_time.update(time.time() - start)
 
-        # Move to GPU, if available
-        imgs = imgs.to(device)
-        targets = tags.to(device)
-
         # Forward prop.
-        scores = encoder(imgs)
-        # Calculate loss
-        loss = criterion(scores, targets)
+        with torch.cuda.amp.autocast(enabled=use_amp):
+            scores = encoder(imgs, logits=True)
+            # Calculate loss
+            loss = criterion(scores, targets)
 
-        # Back prop.
-        encoder_optimizer.zero_grad()
-        loss.backward()
+        # Back prop., accumulating gradients over accum_steps batches
+        # (the last window of the epoch may be shorter)
+        if i % accum_steps == 0:
+            encoder_optimizer.zero_grad(set_to_none=True)
+        window = min(accum_steps, num_batches - (i // accum_steps) * accum_steps)
+        scaler.scale(loss / window).backward()
 
-        # Clip gradients
-        clip_gradient(encoder_optimizer, grad_clip)
+        if (i + 1) % accum_steps == 0 or (i + 1) == num_batches:
+            # Clip gradients (unscaled first, so the clip value keeps its meaning)
+            scaler.unscale_(encoder_optimizer)
+            clip_gradient(encoder_optimizer, grad_clip)
 
-        # Update weights
-        encoder_optimizer.step()
+            # Update weights
+            scaler.step(encoder_optimizer)
+            scaler.update()
 
         # Keep track of metrics
-        acc = binary_accuracy(scores, targets)
-        losses.update(loss.item())
-        accs.update(acc)
+        loss_sum += loss.detach()
+        acc_sum += binary_accuracy(scores.detach(), targets, logits=True)
+        count += 1
         batch_time.update(time.time() - start)
 
         start = time.time()
 
         # Print status
         if i % print_freq == 0:
+            losses.update(loss_sum.item() / count, count)
+            accs.update(acc_sum.item() / count, count)
+            loss_sum.zero_()
+            acc_sum.zero_()
+            count = 0
+
             print('Epoch: [{0}][{1}/{2}]\t'
                   'Batch Time {batch_time.val:.3f} ({batch_time.avg:.3f})\t'
                   'Data Load Time {data_time.val:.3f} ({data_time.avg:.3f})\t'
                   'Loss {loss.val:.4f} ({loss.avg:.4f})\t'
-                  'Top-5 Accuracy {accs.val:.3f} ({accs.avg:.3f})'.format(epoch, i, len(train_loader),
+                  'Top-5 Accuracy {accs.val:.3f} ({accs.avg:.3f})'.format(epoch, i, num_batches,
                                                                           batch_time=batch_time,
                                                                           data_time=data_time, loss=losses,
                                                                           accs=accs))
@@ -209,38 +276,45 @@ def validate(val_loader, encoder, criterion):
     losses = AverageMeter()
     accs = AverageMeter()
 
+    # Metrics summed on device, synced once after the last batch
+    running_loss = torch.zeros((), device=device)
+    running_acc = torch.zeros((), device=device)
+    running_total = 0
+
+    num_val_batches = len(val_loader)
+
     start = time.time()
 
     # explicitly disable gradient calculation to avoid CUDA memory error
-    # solves the issue #57
-    with torch.no_grad():
-        # Batches
-        for i, (imgs, tags) in enumerate(val_loader):
-
-            # Move to device, if available
-            imgs = imgs.to(device)
-            targets = tags.to(device)
+    # solves the issue #57; inference mode also skips autograd bookkeeping
+    with torch.inference_mode():
+        # Batches, already on device (moved by the prefetcher)
+        for i, (imgs, targets) in enumerate(val_loader):
 
             # Forward prop.
-            scores = encoder(imgs)
+            with torch.cuda.amp.autocast(enabled=use_amp):
+                scores = encoder(imgs, logits=True)
 
-            # Calculate loss
-            loss = criterion(scores, targets)
+                # Calculate loss
+                loss = criterion(scores, targets)
 
             # Keep track of metrics
-            losses.update(loss.item())
-            acc = binary_accuracy(scores, targets)
-            accs.update(acc)
+            n = imgs.size(0)
+            running_loss += loss * n
+            running_acc += binary_accuracy(scores, targets, logits=True) * n
+            running_total += n
             batch_time.update(time.time() - start)
 
             start = time.time()
 
             if i % print_freq == 0:
                 print('Validation: [{0}/{1}]\t'
-                      'Batch Time {batch_time.val:.3f} ({batch_time.avg:.3f})\t'
-                      'Loss {loss.val:.4f} ({loss.avg:.4f})\t'
-                      'Accuracy {accs.val:.3f} ({accs.avg:.3f})\t'.format(i, len(val_loader), batch_time=batch_time,
-                                                                          loss=losses, accs=accs))
+                      'Batch Time {batch_time.val:.3f} ({batch_time.avg:.3f})\t'.format(i, num_val_batches,
+                                                                                        batch_time=batch_time))
+
+        if running_total > 0:
+            losses.update(running_loss.item() / running_total, running_total)
+            accs.update(running_acc.item() / running_total, running_total)
 
         print(
             '\n * LOSS - {loss.avg:.3f}, ACCURACY - {acc.avg:.3f}\n'.format(
@@ -1,3 +1,6 @@
+import copy
+import threading
+
 import torch
 
 
@@ -36,7 +39,8 @@ def save_tagger_checkpoint(data_name,
                            encoder,
                            encoder_optimizer,
                            accuracy,
-                           is_best):
+                           is_best,
+                           background=False):
     r"""Saves model tagger checkpoint.
 
     Arguments
@@ -47,6 +51,10 @@ def save_tagger_checkpoint(data_name,
         encoder_optimizer (Optimizer): optimizer to update encoder's weights, if fine-tuning
         bleu4 (Float): validation BLEU-4 score for this epoch
         is_best (boolean): is this checkpoint the best so far?
+        background (boolean, optional): write the checkpoint from a background thread
+    Return
+        threading.Thread writing the checkpoint if background (its join() re-raises
+        any error from the write), None otherwise
     """
     state = {'epoch': epoch,
              'epochs_since_improvement': epochs_since_improvement,
@@ -54,6 +62,62 @@ def save_tagger_checkpoint(data_name,
              'encoder': encoder,
              'encoder_optimizer': encoder_optimizer}
     filename = 'checkpoint_tagger_' + data_name + '.pth.tar'
+
+    if background:
+        # Snapshot to CPU on the calling thread, so training can keep updating the originals
+        state = _cpu_snapshot(state, encoder, encoder_optimizer)
+        thread = _CheckpointWriter(state, filename, is_best)
+        thread.start()
+        return thread
+
+    _write_checkpoint(state, filename, is_best)
+
+
+def _cpu_snapshot(state, model, optimizer):
+    r"""Deep copies a checkpoint state with the model and optimizer tensors copied to CPU.
+
+    The CPU copies are seeded into the deepcopy memo, so no second copy is made on the
+    device and the copied optimizer still refers to the copied parameters. copy=True
+    also copies tensors already on CPU, which training would otherwise keep updating.
+    """
+    memo = {}
+    for param in model.parameters():
+        memo[id(param)] = torch.nn.Parameter(param.detach().to('cpu', copy=True),
+                                             requires_grad=param.requires_grad)
+    for buffer in model.buffers():
+        memo[id(buffer)] = buffer.detach().to('cpu', copy=True)
+    for param_state in optimizer.state.values():
+        for value in param_state.values():
+            if torch.is_tensor(value):
+                memo[id(value)] = value.detach().to('cpu', copy=True)
+
+    return copy.deepcopy(state, memo)
+
+
+class _CheckpointWriter(threading.Thread):
+    r"""Thread writing a checkpoint, join() re-raises an error raised while writing."""
+
+    def __init__(self, state, filename, is_best):
+        super(_CheckpointWriter, self).__init__()
+        self.state = state
+        self.filename = filename
+        self.is_best = is_best
+        self.error = None
+
+    def run(self):
+        try:
+            _write_checkpoint(self.state, self.filename, self.is_best)
+        except Exception as e:
+            self.error = e
+
+    def join(self, timeout=None):
+        super(_CheckpointWriter, self).join(timeout)
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+
+def _write_checkpoint(state, filename, is_best):
     torch.save(state, filename)
     # If this checkpoint is the best so far, store a copy so it doesn't get overwritten by a worse checkpoint
     if is_best:
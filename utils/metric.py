@@ -1,6 +1,3 @@
-import torch
-
-
 class AverageMeter(object):
     """
     Keeps track of most recent, average, sum, and count of a metric.
@@ -39,9 +36,18 @@ def accuracy(scores, targets, k):
     return correct_total.item() * (100.0 / batch_size)
 
 
-def binary_accuracy(score, targets):
-    mean = (score >= 0.5).eq(targets >= 0.5) \
-        .type(torch.FloatTensor) \
+def binary_accuracy(score, targets, logits=False):
+    """
+    Computes binary accuracy of multi-label predictions.
+
+    :param score: probabilities (or logits) from the model
+    :param targets: true labels
+    :param logits: score holds logits, so threshold at 0 instead of 0.5
+    :return: binary accuracy, 0D tensor on the same device as score
+    """
+    threshold = 0. if logits else 0.5
+    mean = (score >= threshold).eq(targets >= 0.5) \
+        .float() \
         .mean()
 
     return mean * 100.0
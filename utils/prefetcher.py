@@ -0,0 +1,92 @@
+import torch
+
+
+class CUDAPrefetcher(object):
+    r"""Wraps a DataLoader and copies the next batch to the GPU on a side stream
+    while the current batch is being computed.
+
+    If mean and std are given, images are expected as uint8 and are converted to float
+    and normalized on the device, so only uint8 data goes through the loader and PCIe.
+
+    Falls back to plain iteration (with a blocking copy) when CUDA is not available.
+
+    Arguments
+        loader (torch.utils.data.DataLoader): loader yielding (imgs, tags) batches
+        device (torch.device): device to move batches to
+        mean (list, optional): per channel mean, in [0, 1] range
+        std (list, optional): per channel standard deviation, in [0, 1] range
+        channels_last (boolean, optional): convert images to channels_last memory format
+    """
+
+    def __init__(self, loader, device, mean=None, std=None, channels_last=False):
+        self.loader = loader
+        self.device = device
+        self.memory_format = torch.channels_last if channels_last else torch.contiguous_format
+        self.stream = torch.cuda.Stream() if device.type == 'cuda' else None
+
+        self.mean = None
+        self.std = None
+        if mean is not None and std is not None:
+            self.mean = torch.tensor([x * 255 for x in mean],
+                                     device=device).view(1, 3, 1, 1)
+            self.std = torch.tensor([x * 255 for x in std],
+                                    device=device).view(1, 3, 1, 1)
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        self.iterator = iter(self.loader)
+        self.preload()
+        batch = self.next()
+        while batch is not None:
+            yield batch
+            batch = self.next()
+
+    def preload(self):
+        r"""Fetches the next batch and starts its asynchronous copy to the device."""
+        try:
+            imgs, tags = next(self.iterator)
+        except StopIteration:
+            self.next_imgs = None
+            self.next_tags = None
+            return
+
+        if self.stream is None:
+            self.next_imgs = self.normalize(imgs.to(self.device))
+            self.next_tags = tags.to(self.device)
+            return
+
+        with torch.cuda.stream(self.stream):
+            self.next_imgs = self.normalize(
+                imgs.to(self.device, non_blocking=True))
+            self.next_tags = tags.to(self.device, non_blocking=True)
+
+    def normalize(self, imgs):
+        r"""Converts uint8 images to normalized float images, if mean and std are set."""
+        imgs = imgs.contiguous(memory_format=self.memory_format)
+        if self.mean is None:
+            return imgs
+        return imgs.float().sub_(self.mean).div_(self.std)
+
+    def next(self):
+        r"""Returns the prefetched batch and starts prefetching the following one.
+
+        Return
+            tuple of (imgs, tags) on device, None when the loader is exhausted
+        """
+        if self.stream is not None:
+            torch.cuda.current_stream().wait_stream(self.stream)
+
+        imgs = self.next_imgs
+        tags = self.next_tags
+        if imgs is None:
+            return None
+
+        if self.stream is not None:
+            # tensors were allocated on the side stream but are used on the current one
+            imgs.record_stream(torch.cuda.current_stream())
+            tags.record_stream(torch.cuda.current_stream())
+
+        self.preload()
+        return imgs, tags